@@ -6,6 +6,7 @@ from Graph.utils.question_utils import VectorStoreManager
 def get_past_questions(question: str, k: int = 5) -> List:
     """
     Tool to get filtered past questions based on the user's query.
+    Also answers which questions repeat across years (most frequently asked), with their years and frequency.
     
     Args:
         question: Detailed natural language question from user
@@ -0,0 +1,122 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+from Schema.schema import QuestionSearch
+from core.partitioning import PARTITION_KEY_FIELD, partition_keys_for_search
+
+# Canonical order of the filtered fields, the partition clause always comes first
+FIELD_ORDER = [
+    PARTITION_KEY_FIELD, "subject", "id", "year_bs", "year_ad", "type", "format", "marks",
+    "topic", "unit", "question_number", "source", "semester",
+]
+# Clauses that only select the slice of the collection a query targets
+PARTITION_FIELDS = (PARTITION_KEY_FIELD, "subject")
+# An AD year maps to two BS years, so its partition keys are wider than the year itself
+# and the year_ad clause has to stay with the partition clause to select the exact papers
+SLICE_FIELDS = PARTITION_FIELDS + ("year_ad",)
+# QuestionSearch fields that control how a search runs, not what it matches
+CONTROL_FIELDS = ("metadata_only", "repeated_only")
+
+# A clause is (field, operator, value), `in` clauses hold a sorted tuple of values
+Clause = Tuple[str, str, Any]
+
+
+class FilterPlan:
+    """
+    Compiled form of a QuestionSearch filter.
+
+    The same plan is emitted as a templated Milvus expression with separate parameters
+    (`expression` / `params`) and evaluated in process (`matches`), so every search
+    path applies the same semantics.
+    """
+
+    def __init__(self, clauses: Tuple[Clause, ...]):
+        self.clauses = clauses
+        # Template placeholders are named after the fields, e.g. "year_bs in {year_bs}"
+        self.expression = " and ".join(f"{field} {op} {{{field}}}" for field, op, _ in clauses)
+        self.params: Dict[str, Any] = {
+            field: list(value) if op == "in" else value for field, op, value in clauses
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self.clauses)
+
+    def __repr__(self) -> str:
+        return f"FilterPlan({self.render()!r})"
+
+    def render(self) -> str:
+        """Render the plan as a literal expression, for logging and APIs that take no parameters"""
+        parts = []
+        for field, op, value in self.clauses:
+            literal = json.dumps(list(value) if op == "in" else value, ensure_ascii=False)
+            parts.append(f"{field} {op} {literal}")
+        return " and ".join(parts)
+
+    def partition_plan(self) -> "FilterPlan":
+        """Get the plan made of only the clauses that select the subject and year slice of the collection"""
+        return _compile(tuple(clause for clause in self.clauses if clause[0] in SLICE_FIELDS))
+
+    def search_kwargs(self) -> dict:
+        """Get the keyword arguments applying the plan to a Milvus search or query"""
+        if not self.clauses:
+            return {}
+        return {"expr": self.expression, "filter_params": self.params}
+
+    def matches(self, metadata: dict) -> bool:
+        """
+        Evaluate the plan against a record in process.
+
+        A list value in the record (e.g. all the years a repeated question appeared in)
+        matches when any of its items does.
+        """
+        for field, op, value in self.clauses:
+            if field not in metadata:
+                return False
+            found = metadata[field]
+            candidates = found if isinstance(found, (list, tuple, set)) else [found]
+            allowed = value if op == "in" else (value,)
+            if not any(candidate in allowed for candidate in candidates):
+                return False
+        return True
+
+
+def normalize_filter(query_result: QuestionSearch) -> Tuple[Clause, ...]:
+    """
+    Normalize a QuestionSearch into its filter clauses.
+
+    Fields are put in canonical order and lists are sorted and deduplicated, so queries
+    asking for the same records share one normalized key whatever order they came in.
+    """
+    filter_dict = query_result.model_dump(exclude=set(CONTROL_FIELDS))
+    clauses = []
+
+    partition_keys = partition_keys_for_search(
+        filter_dict.get("subject"), filter_dict.get("year_bs"), filter_dict.get("year_ad")
+    )
+    if partition_keys:
+        clauses.append((PARTITION_KEY_FIELD, "in", tuple(partition_keys)))
+    elif filter_dict.get("subject"):
+        # without years nothing can be pruned, the subject still has to match
+        clauses.append(("subject", "==", filter_dict["subject"]))
+
+    for field in FIELD_ORDER:
+        value = filter_dict.get(field)
+        if field in PARTITION_FIELDS or value is None:
+            continue
+        if isinstance(value, list):
+            if value:  # Only add if list is not empty
+                clauses.append((field, "in", tuple(sorted(set(value)))))
+        else:
+            clauses.append((field, "==", value))
+
+    return tuple(clauses)
+
+
+@lru_cache(maxsize=1024)
+def _compile(clauses: Tuple[Clause, ...]) -> FilterPlan:
+    return FilterPlan(clauses)
+
+
+def compile_filter(query_result: QuestionSearch) -> FilterPlan:
+    """Compile a QuestionSearch into a FilterPlan, plans are cached by their normalized key"""
+    return _compile(normalize_filter(query_result))
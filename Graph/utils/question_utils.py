@@ -1,10 +1,17 @@
 from Model.models import llm
 from langchain_core.prompts import ChatPromptTemplate
+import os
 from Schema.schema import QuestionSearch
 from Prompts.agent_prompt import QUESTION_PROMPT
 from typing_extensions import Dict, List
 from core.db_manager import db_manager
 from langchain_core.documents import Document
+from core.partitioning import PARTITION_KEY_FIELD, question_key
+from core.vector_index import TEXT_FIELD, VECTOR_FIELD, get_collection_index_type, get_search_params
+from core.question_clusters import QuestionClusterIndex
+from core.bm25_index import BM25Index, reciprocal_rank_fusion
+from core.stage_timer import stage, record_retrieved_ids
+from .filter_compiler import FilterPlan, compile_filter
 
 class QuestionProcessor:
     """Handles the processing of natural language queries into structured format."""
@@ -16,44 +23,20 @@ class QuestionProcessor:
             ("human", "{question}"),
         ]) | self.structured_llm
 
-    def create_dynamic_filter(self, query_result: QuestionSearch) -> tuple[str, bool]:
+    def create_dynamic_filter(self, query_result: QuestionSearch) -> tuple[FilterPlan, bool]:
         """
-        Create a Milvus filter expression from the query result.
-        
+        Create a Milvus filter from the query result.
+
+        The filter is compiled into a FilterPlan: a templated expression with separate
+        parameters, so values are never quoted by hand, and the same plan is reused for
+        every query asking for the same records.
+
         Returns:
             Tuple containing:
-            - String containing the Milvus filter expression
+            - FilterPlan with the Milvus filter expression and its parameters
             - Boolean indicating if metadata_only is True
         """
-        # Extract metadata_only before processing
-        metadata_only = query_result.metadata_only
-        
-        # Get the model dump and remove metadata_only
-        filter_dict = query_result.model_dump()
-        filter_dict.pop('metadata_only', False)
-        
-        filter_parts = []
-        
-        for field_name, value in filter_dict.items():
-            if value is not None:
-                # this field is redundant if we are building RAG for specific subject separately
-                if field_name == 'subject':
-                    pass
-                elif field_name in ['year_ad', 'year_bs'] and isinstance(value, list):
-                    if value:  # Only if the list is not empty
-                        years_str = ', '.join(map(str, value))
-                        filter_parts.append(f"{field_name} in [{years_str}]")
-                elif isinstance(value, list):
-                    if value:  # Only add if list is not empty
-                        values_str = ', '.join(f"'{v}'" for v in value)
-                        filter_parts.append(f"{field_name} in [{values_str}]")
-                else:
-                    if isinstance(value, str):
-                        filter_parts.append(f"{field_name} == '{value}'")
-                    else:
-                        filter_parts.append(f"{field_name} == {value}")
-        
-        return (" and ".join(filter_parts) if filter_parts else ""), metadata_only
+        return compile_filter(query_result), query_result.metadata_only
 
     def process_query(self, question: str) -> QuestionSearch:
         """
@@ -68,46 +51,84 @@ class QuestionProcessor:
         return self.structured_chain.invoke({"question": question})
 
 
+RETRIEVAL_MODES = ["dense", "hybrid", "auto"]
+
+
 class VectorStoreManager:
     """Manages vector store operations and question retrieval."""
     
-    def __init__(self, collection_name: str = "ioe_c_past_questions"):
+    def __init__(self, collection_name: str = "ioe_c_past_questions", search_params: Dict = None,
+                 retrieval_mode: str = None):
         self.collection_name = collection_name
+        # Overrides for the index search params (e.g. {"ef": 128} for HNSW, {"nprobe": 32} for IVF_FLAT)
+        self.search_params = search_params
+        # dense: embeddings only, hybrid: embeddings fused with BM25,
+        # auto: BM25 alone for short keyword queries, hybrid otherwise
+        self.retrieval_mode = retrieval_mode or os.getenv("RETRIEVAL_MODE", "auto")
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unsupported retrieval mode '{self.retrieval_mode}', expected one of {RETRIEVAL_MODES}")
         self.question_processor = QuestionProcessor()
 
-    def get_filtered_questions(self, question: str, k: int = 3) -> List:
+    def get_filtered_questions(self, question: str, k: int = 3, search_params: Dict = None) -> List:
+        """
+        Retrieve past questions matching the user's query.
+
+        Args:
+            question: Natural language question from the user
+            k: Maximum number of results to retrieve
+            search_params: Per request overrides for the index search params
+        """
         try:
+            # Process the query
+            with stage("parse"):
+                query_result = self.question_processor.process_query(question)
+
+            if query_result.repeated_only:
+                cluster_index = QuestionClusterIndex.load(self.collection_name)
+                if cluster_index is not None:
+                    print("[INFO] Returning questions from the <REPEATED QUESTION> clusters...")
+                    with stage("clusters"):
+                        cluster_results = cluster_index.most_repeated(compile_filter(query_result), k=k)
+                    record_retrieved_ids([key for doc in cluster_results for key in doc.metadata["question_keys"]])
+                    return {
+                        "results": cluster_results,
+                    }
+                print(f"[INFO] No question clusters for {self.collection_name}, falling back to search")
+
             vector_store = db_manager.get_vector_store(
                 collection_name=self.collection_name
-            )    
-            # Process the query
-            query_result = self.question_processor.process_query(question)
-            filter_expression, metadata_only = self.question_processor.create_dynamic_filter(query_result)
+            )
+            filter_plan, metadata_only = self.question_processor.create_dynamic_filter(query_result)
 
-            print(f"[INFO] Filter dictionary: {filter_expression}")  # Debug print
+            print(f"[INFO] Filter dictionary: {filter_plan.render()}")  # Debug print
             print(f"[INFO] metadata_only field is {metadata_only}")
             if metadata_only == True:
-                # Use search_by_metadata instead of as_retriever
+                # Query the collection directly so the filter parameters are passed separately
                 print("[INFO] Returning questions based on <METADATA> filters...")
-                search_results = vector_store.search_by_metadata(
-                        expr=filter_expression,
-                        limit=k
-                    )
+                with stage("search"):
+                    search_results = vector_store.client.query(
+                            self.collection_name,
+                            filter=filter_plan.expression,
+                            filter_params=filter_plan.params,
+                            output_fields=[field for field in vector_store.fields if field != VECTOR_FIELD],
+                            limit=k
+                        )
                     
                 # Filter out the vector field from each result
                 filtered_results = []
                 for result in search_results:
-                    # Create a new metadata dictionary without the vector field
-                    filtered_metadata = {k: v for k, v in result.metadata.items() if k != 'vector'}
+                    # Create a new metadata dictionary without the vector and text fields
+                    filtered_metadata = {k: v for k, v in result.items() if k not in (VECTOR_FIELD, TEXT_FIELD, PARTITION_KEY_FIELD)}
                     # print(f"[INFO] Filtered metadata\n----\n{filtered_metadata}\n----\n")
                     
                     # Create a new Document with filtered metadata
                     filtered_doc = Document(
-                        page_content=result.page_content,
+                        page_content=result[TEXT_FIELD],
                         metadata=filtered_metadata
                     )
                     filtered_results.append(filtered_doc)
                     
+                record_retrieved_ids([question_key(doc.metadata) for doc in filtered_results])
                 # Create a response dictionary with both results and filter info
                 response = {
                     "results": filtered_results,
@@ -115,17 +136,43 @@ class VectorStoreManager:
                 return response
             else:
                 # semantic filtering
-                retriever = vector_store.as_retriever(
-                    search_kwargs={'k': k},
-                )
-                print("[INFO] Returning questions with <SEMANTIC> filtering...")
-                search_results = retriever.invoke(question)
+                # only the subject and year part of the filter is applied, so the semantic search
+                # scans the targeted slice without being narrowed by the other metadata
+                partition_plan = filter_plan.partition_plan()
+                lexical_index = BM25Index.load(self.collection_name) if self.retrieval_mode != "dense" else None
+
+                if lexical_index is not None and self.retrieval_mode == "auto" and lexical_index.is_keyword_query(question):
+                    # a few known keywords, BM25 answers without embedding the query
+                    print("[INFO] Returning questions with <KEYWORD> search...")
+                    with stage("lexical"):
+                        search_results = lexical_index.search(question, k, partition_plan)
+                else:
+                    # fetch more candidates when they are fused with the keyword results
+                    fetch_k = k * 2 if lexical_index is not None else k
+                    search_kwargs = {
+                        'k': fetch_k,
+                        'param': get_search_params(get_collection_index_type(self.collection_name), k=fetch_k,
+                                                   search_params=search_params or self.search_params),
+                        **partition_plan.search_kwargs(),
+                    }
+                    print("[INFO] Returning questions with <SEMANTIC> filtering...")
+                    # embedding and search are run separately so each stage can be timed
+                    with stage("embed"):
+                        query_embedding = db_manager.embeddings.embed_query(question)
+                    with stage("search"):
+                        search_results = vector_store.similarity_search_by_vector(query_embedding, **search_kwargs)
+
+                    if lexical_index is not None:
+                        print("[INFO] Fusing <SEMANTIC> results with <KEYWORD> search...")
+                        with stage("lexical"):
+                            lexical_results = lexical_index.search(question, fetch_k, partition_plan)
+                        search_results = reciprocal_rank_fusion([search_results, lexical_results], k)
                 
                 # Filter out the vector field from each result
                 filtered_results = []
                 for result in search_results:
                     # Create a new metadata dictionary without the vector field
-                    filtered_metadata = {k: v for k, v in result.metadata.items() if k != 'vector'}
+                    filtered_metadata = {k: v for k, v in result.metadata.items() if k not in (VECTOR_FIELD, PARTITION_KEY_FIELD)}
                     # print(f"[INFO] Filtered metadata\n----\n{filtered_metadata}\n----\n")
                     
                     # Create a new Document with filtered metadata
@@ -134,7 +181,8 @@ class VectorStoreManager:
                         metadata=filtered_metadata
                     )
                     filtered_results.append(filtered_doc)
-                    
+
+                record_retrieved_ids([question_key(doc.metadata) for doc in filtered_results])
                 response = {
                     "results": filtered_results,
                 }
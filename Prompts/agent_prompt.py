@@ -58,6 +58,13 @@ Set metadata_only to False if the query:
 3. Uses natural language to describe what they're looking for
 4. Doesn't specify exact metadata values
 
+IMPORTANT: Set repeated_only to True if the user asks which questions repeat across years,
+are asked most frequently or are most important based on how often they appeared. Keep the other
+fields (e.g. topic, type, marks) as filters. Examples of queries that should use repeated_only=True:
+- "Which questions repeat every year?"
+- "Most asked questions about pointers"
+- "Frequently asked programming questions on file handling"
+
 Map this extracted information accurately to the corresponding fields in the `QuestionSearch` JSON schema.
 - Pay close attention to the required fields and the allowed values for fields with `Literal` types (like `subject`, `type`, `format`, `source`, `semester`).
 - Use `null` or omit optional fields if the information is not provided in the user's query.
@@ -64,6 +64,11 @@ class QuestionSearch(BaseModel):
          description="Semester the question is for." 
     )
 
+    repeated_only: bool = Field(
+        default=False,
+        description="True if the user asks which questions repeat across years or are asked most frequently."
+    )
+
     metadata_only: bool = Field(
         default=False,
         description="True if the user's query can be answered using only metadata filtering, False if semantic search is needed."
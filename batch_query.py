@@ -0,0 +1,123 @@
+"""
+Run a file of queries through the graph with a bounded worker pool.
+
+Used for regression / evaluation runs and to warm the model, embedding and vector
+store paths before heavy traffic. The input is either a JSONL file with a "query" and
+an optional "sender_id" on every line, or a plain text file with one query per line.
+Queries of the same sender run in order on one worker so they share the conversation
+history; different senders run concurrently.
+
+Usage:
+    python batch_query.py queries.jsonl --output answers.jsonl --workers 4
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from graph_building import build_graph
+from core.stage_timer import record_stages
+from core.checkpointer import create_checkpointer, close_checkpointer
+
+load_dotenv()
+
+def load_queries(file_path: str) -> list[dict]:
+    """Load queries as {"index", "query", "sender_id"} items, lines without a sender get their own thread"""
+    items = []
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+            else:
+                record = {"query": line}
+            index = len(items)
+            items.append({
+                "index": index,
+                "query": record["query"],
+                "sender_id": record.get("sender_id") or f"batch-{index}",
+            })
+    return items
+
+
+def run_query(graph, item: dict, recursion_limit: int = 25) -> dict:
+    """Run one query through the graph and collect its answer, retrieved question keys and stage timings"""
+    initial_state = {
+        "messages": [HumanMessage(content=item["query"])],
+        "query": item["query"],
+        "context": {}
+    }
+    config = {
+        "configurable": {
+            "thread_id": item["sender_id"]
+        },
+        "recursion_limit": recursion_limit
+    }
+
+    record = dict(item)
+    with record_stages() as stats:
+        start = time.perf_counter()
+        try:
+            result = graph.invoke(initial_state, config=config)
+            record["answer"] = result["messages"][-1].content
+        except Exception as e:
+            print(f"[ERROR] Query {item['index']} failed: {str(e)}")
+            record["error"] = str(e)
+        stats["timings"]["total"] = round((time.perf_counter() - start) * 1000, 3)
+
+    record["retrieved_ids"] = stats["retrieved_ids"]
+    record["timings"] = stats["timings"]
+    return record
+
+
+def run_sender(graph, items: list[dict]) -> list[dict]:
+    """Run the queries of one sender in order"""
+    return [run_query(graph, item) for item in items]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a batch of queries through the IOE-GPT graph")
+    parser.add_argument("input", help="JSONL file of {query, sender_id?} or text file with one query per line")
+    parser.add_argument("--output", default="batch_output.jsonl", help="JSONL file to write the answers to")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum number of queries run concurrently")
+    parser.add_argument("--checkpointer", choices=["memory", "redis"], default="memory",
+                        help="Keep conversation history in memory (default) or in Redis like the server")
+    args = parser.parse_args()
+
+    items = load_queries(args.input)
+    senders: dict[str, list[dict]] = {}
+    for item in items:
+        senders.setdefault(item["sender_id"], []).append(item)
+    print(f"[INFO] Loaded {len(items)} queries from {len(senders)} senders, running with {args.workers} workers")
+
+    if args.checkpointer == "redis":
+        # one pooled connection per worker, background checkpoint writes wait for a free one
+        checkpointer = create_checkpointer(max_connections=args.workers + 1)
+    else:
+        checkpointer = InMemorySaver()
+
+    try:
+        graph = build_graph(checkpointer)
+        completed = 0
+        start = time.perf_counter()
+        with open(args.output, 'w', encoding='utf-8') as output, \
+                ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(run_sender, graph, sender_items) for sender_items in senders.values()]
+            for future in as_completed(futures):
+                for record in future.result():
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    completed += 1
+                output.flush()
+                print(f"[INFO] Completed {completed}/{len(items)} queries")
+        print(f"[INFO] Batch finished in {time.perf_counter() - start:.1f}s, results written to {args.output}")
+    finally:
+        if args.checkpointer == "redis":
+            close_checkpointer(checkpointer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Recall@k / latency benchmark for the Milvus index types on the question corpus.
+
+Every index type is built on a scratch collection holding the corpus embeddings and
+searched with a sweep of search params. The query questions are held out of the
+collection, so no query finds itself. Recall is measured against exact (brute force)
+search; a returned question is a hit when it is as close as the exact k-th neighbour,
+so ties between repeated questions are not counted as misses. The numbers can be used
+to choose MILVUS_INDEX_TYPE and MILVUS_SEARCH_EF / MILVUS_SEARCH_NPROBE. Milvus serves very small segments by brute force, so on a tiny
+corpus every setting reaches full recall.
+
+Usage:
+    python -m benchmarks.ann_benchmark --file formatted_data/c_question.json --k 5
+"""
+import argparse
+import json
+import random
+import time
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+from core.db_manager import db_manager
+from core.vector_index import INDEX_TYPES, VECTOR_FIELD, build_index, get_index_params, get_metric_type, get_search_params
+
+# Search params swept for each index type, HNSW ef values below k are raised to k like in the app
+SEARCH_SWEEP = {
+    "FLAT": [{}],
+    "HNSW": [{"ef": ef} for ef in (8, 16, 32, 64, 128, 256)],
+    "IVF_FLAT": [{"nprobe": nprobe} for nprobe in (1, 4, 8, 16, 32, 64)],
+}
+
+
+def exact_distances(corpus: np.ndarray, queries: np.ndarray, metric_type: str) -> np.ndarray:
+    """Get the distance of every query to every corpus vector, smaller is closer"""
+    if metric_type == "L2":
+        scores = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ corpus.T + (corpus ** 2).sum(axis=1)[None, :]
+    else:
+        if metric_type == "COSINE":
+            corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        # larger inner product is closer
+        scores = -(queries @ corpus.T)
+    return scores
+
+
+def create_scratch_collection(name: str, vectors: np.ndarray) -> Collection:
+    """Create a collection holding only ids and vectors"""
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema([
+        FieldSchema("pk", DataType.INT64, is_primary=True),
+        FieldSchema(VECTOR_FIELD, DataType.FLOAT_VECTOR, dim=vectors.shape[1]),
+    ])
+    collection = Collection(name, schema)
+    collection.insert([list(range(len(vectors))), vectors.tolist()])
+    return collection
+
+
+def run_search(collection: Collection, queries: np.ndarray, k: int, param: dict) -> tuple[list, list]:
+    """Search every query one at a time, returning the result ids and the latency of each search"""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = collection.search([query.tolist()], VECTOR_FIELD, param, limit=k)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([hit.id for hit in hits])
+    return results, latencies
+
+
+def recall_at_k(results: list, distances: np.ndarray, k: int) -> float:
+    """Average fraction of the top k returned, a result is a hit when it is no farther than the exact k-th neighbour"""
+    kth_distances = np.partition(distances, k - 1, axis=1)[:, k - 1]
+    # tolerance for float error between equal vectors
+    tolerance = 1e-5 * np.maximum(1.0, np.abs(kth_distances))
+    hits = [sum(1 for i in set(found) if distances[q, i] <= kth_distances[q] + tolerance[q])
+            for q, found in enumerate(results)]
+    return float(np.mean([min(hit, k) / k for hit in hits]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall@k and latency of Milvus index types")
+    parser.add_argument("--file", default="formatted_data/c_question.json", help="Question corpus (JSON)")
+    parser.add_argument("--k", type=int, default=5, help="Number of neighbours to retrieve")
+    parser.add_argument("--queries", type=int, default=100,
+                        help="Number of questions held out of the collection and used as queries")
+    parser.add_argument("--index-types", nargs="+", default=INDEX_TYPES, choices=INDEX_TYPES)
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    with open(args.file, "r", encoding="utf-8") as file:
+        questions = [item["question"] for item in json.load(file)]
+
+    # at least k questions stay in the collection
+    num_queries = min(args.queries, len(questions) - args.k)
+    if num_queries < 1:
+        raise ValueError(f"Need more than {args.k} questions to hold out queries, got {len(questions)}")
+    held_out = set(random.Random(0).sample(range(len(questions)), num_queries))
+
+    print(f"[INFO] Embedding {len(questions)} questions...")
+    vectors = np.array(db_manager.embeddings.embed_documents(questions), dtype=np.float32)
+    queries = vectors[sorted(held_out)]
+    corpus = vectors[[i for i in range(len(questions)) if i not in held_out]]
+    print(f"[INFO] Indexing {len(corpus)} questions, querying with {len(queries)} held out ones")
+
+    metric_type = get_metric_type()
+    distances = exact_distances(corpus, queries, metric_type)
+
+    rows = []
+    for index_type in args.index_types:
+        name = f"ann_benchmark_{index_type.lower()}"
+        collection = create_scratch_collection(name, corpus)
+        try:
+            index_params = get_index_params(index_type)
+            start = time.perf_counter()
+            build_index(name, index_params)
+            build_seconds = time.perf_counter() - start
+
+            swept = []
+            for search_params in SEARCH_SWEEP[index_type]:
+                param = get_search_params(index_type, args.k, search_params)
+                search_params = param["params"]
+                # ef values clamped to the same k give the same search
+                if search_params in swept:
+                    continue
+                swept.append(search_params)
+                results, latencies = run_search(collection, queries, args.k, param)
+                rows.append({
+                    "index_type": index_type,
+                    "build_params": index_params["params"],
+                    "search_params": search_params,
+                    "build_seconds": round(build_seconds, 3),
+                    f"recall@{args.k}": round(recall_at_k(results, distances, args.k), 4),
+                    "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                    "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                })
+                print(f"[INFO] {rows[-1]}")
+        finally:
+            utility.drop_collection(name)
+
+    print(f"\n{'index':<10}{'search params':<20}{'recall@' + str(args.k):<12}{'p50 ms':<10}{'p95 ms':<10}")
+    for row in rows:
+        print(f"{row['index_type']:<10}{json.dumps(row['search_params']):<20}"
+              f"{row[f'recall@{args.k}']:<12}{row['p50_ms']:<10}{row['p95_ms']:<10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(rows, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare Redis writes, bytes and memory per conversation turn of the full and shallow checkpointers.
+
+A small graph with the same shape as the assistant loop (assistant -> tool -> assistant)
+runs a number of turns on fresh threads with each checkpointer; no LLM is called, so the
+numbers only reflect checkpointing. Run it against a Redis that is otherwise idle, since
+the counters are server wide.
+
+Usage:
+    python -m benchmarks.checkpointer_benchmark --turns 20 --threads 5
+"""
+import argparse
+import uuid
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+from core.checkpointer import CHECKPOINT_MODES, close_checkpointer, create_checkpointer
+
+# Length of the fake answers, roughly a list of retrieved questions
+ANSWER_SIZE = 1500
+
+
+def build_benchmark_graph(checkpointer):
+    """Graph with the super-steps of one assistant turn that calls the question tool once"""
+    def assistant(state: MessagesState):
+        if isinstance(state["messages"][-1], ToolMessage):
+            return {"messages": [AIMessage(content="a" * ANSWER_SIZE)]}
+        tool_call = {"name": "get_past_questions", "args": {"question": "q"}, "id": str(uuid.uuid4())}
+        return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
+
+    def tool(state: MessagesState):
+        tool_call_id = state["messages"][-1].tool_calls[0]["id"]
+        return {"messages": [ToolMessage(content="q" * ANSWER_SIZE, tool_call_id=tool_call_id)]}
+
+    def route(state: MessagesState):
+        return "tool" if state["messages"][-1].tool_calls else END
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("assistant", assistant)
+    builder.add_node("tool", tool)
+    builder.add_edge(START, "assistant")
+    builder.add_conditional_edges("assistant", route, ["tool", END])
+    builder.add_edge("tool", "assistant")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def redis_counters(redis_client) -> dict:
+    """Server wide counters the benchmark is measured with"""
+    stats = redis_client.info("stats")
+    memory = redis_client.info("memory")
+    return {
+        "commands": stats["total_commands_processed"],
+        "bytes_in": stats["total_net_input_bytes"],
+        "used_memory": memory["used_memory"],
+    }
+
+
+def run_mode(mode: str, turns: int, threads: int) -> dict:
+    """Run the turns with one checkpointer mode and measure the Redis cost per turn"""
+    checkpointer = create_checkpointer(mode=mode)
+    redis_client = checkpointer._redis
+    thread_ids = [f"benchmark-{mode}-{uuid.uuid4()}" for _ in range(threads)]
+    try:
+        graph = build_benchmark_graph(checkpointer)
+        before = redis_counters(redis_client)
+        for turn in range(turns):
+            for thread_id in thread_ids:
+                graph.invoke(
+                    {"messages": [HumanMessage(content=f"question {turn}")]},
+                    config={"configurable": {"thread_id": thread_id}},
+                )
+        after = redis_counters(redis_client)
+        total_turns = turns * threads
+        return {
+            "mode": mode,
+            "turns": total_turns,
+            # the two INFO calls of the measurement are not part of the workload
+            "commands_per_turn": round((after["commands"] - before["commands"] - 2) / total_turns, 1),
+            "bytes_in_per_turn": round((after["bytes_in"] - before["bytes_in"]) / total_turns),
+            "memory_per_turn": round((after["used_memory"] - before["used_memory"]) / total_turns),
+            "memory_per_thread": round((after["used_memory"] - before["used_memory"]) / threads),
+        }
+    finally:
+        for thread_id in thread_ids:
+            checkpointer.delete_thread(thread_id)
+        close_checkpointer(checkpointer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs shallow Redis checkpointers")
+    parser.add_argument("--turns", type=int, default=20, help="Conversation turns per thread")
+    parser.add_argument("--threads", type=int, default=5, help="Number of conversation threads")
+    parser.add_argument("--modes", nargs="+", default=list(CHECKPOINT_MODES), choices=CHECKPOINT_MODES)
+    args = parser.parse_args()
+
+    rows = [run_mode(mode, args.turns, args.threads) for mode in args.modes]
+
+    print(f"\n{'mode':<10}{'commands/turn':<16}{'bytes in/turn':<16}{'memory/turn':<14}{'memory/thread':<14}")
+    for row in rows:
+        print(f"{row['mode']:<10}{row['commands_per_turn']:<16}{row['bytes_in_per_turn']:<16}"
+              f"{row['memory_per_turn']:<14}{row['memory_per_thread']:<14}")
+
+
+if __name__ == "__main__":
+    main()
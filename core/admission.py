@@ -0,0 +1,206 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+THREAD_MODES = ("queue", "supersede")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted, carries the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _ThreadSlot:
+    """FIFO turn-taking between the requests of one conversation thread"""
+
+    def __init__(self):
+        self.next_ticket = 0
+        self.serving = 0
+        # tickets of requests that gave up waiting, skipped when their turn comes
+        self.cancelled = set()
+
+    @property
+    def pending(self) -> int:
+        return self.next_ticket - self.serving - len(self.cancelled)
+
+    def advance(self):
+        """Pass the turn to the next request still waiting"""
+        self.serving += 1
+        while self.serving in self.cancelled:
+            self.cancelled.remove(self.serving)
+            self.serving += 1
+
+
+class AdmissionController:
+    """
+    Serializes requests per conversation thread and bounds the number of graph runs in flight.
+
+    Requests of one thread run one at a time in arrival order, so two turns never read the
+    same checkpoint. In "supersede" mode a waiting request whose thread received a newer
+    request is dropped instead of run. Requests share `max_concurrent` global slots, handed
+    out in arrival order; every request that has to wait, for its thread's turn or for a
+    slot, takes a place in one wait queue of `max_queue` and waits at most `queue_timeout`
+    seconds in total. Requests beyond that are rejected with a retry hint.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16, queue_timeout: float = 30.0,
+                 max_pending_per_thread: int = 4, thread_mode: str = "queue"):
+        if thread_mode not in THREAD_MODES:
+            raise ValueError(f"Unsupported thread mode '{thread_mode}', expected one of {THREAD_MODES}")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_pending_per_thread = max_pending_per_thread
+        self.thread_mode = thread_mode
+
+        self._condition = threading.Condition()
+        self._threads: Dict[str, _ThreadSlot] = {}
+        self._in_flight = 0
+        self._queued = 0
+        # requests whose thread turn came, waiting for a global slot in arrival order
+        self._slot_waiters = deque()
+        self._metrics = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "rejected_thread_busy": 0,
+            "superseded": 0,
+            "wait_count": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "run_count": 0,
+            "run_seconds_total": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Create a controller configured from the environment"""
+        return cls(
+            max_concurrent=int(os.getenv("MAX_CONCURRENT_REQUESTS", 4)),
+            max_queue=int(os.getenv("MAX_QUEUED_REQUESTS", 16)),
+            queue_timeout=float(os.getenv("QUEUE_TIMEOUT_SECONDS", 30)),
+            max_pending_per_thread=int(os.getenv("MAX_PENDING_PER_THREAD", 4)),
+            thread_mode=os.getenv("THREAD_QUEUE_MODE", "queue"),
+        )
+
+    def _retry_after(self) -> int:
+        """Estimate in seconds when a slot frees up, from the average run time"""
+        runs = self._metrics["run_count"]
+        average_run = self._metrics["run_seconds_total"] / runs if runs else 1.0
+        return max(1, math.ceil(average_run * (self._queued + 1) / self.max_concurrent))
+
+    def _reject(self, metric: str, status_code: int, detail: str, with_retry_after: bool = True):
+        self._metrics[metric] += 1
+        raise AdmissionRejected(status_code, detail, retry_after=self._retry_after() if with_retry_after else None)
+
+    def _take_ticket(self, thread_id: str) -> tuple[_ThreadSlot, int]:
+        slot = self._threads.setdefault(thread_id, _ThreadSlot())
+        if slot.pending >= self.max_pending_per_thread:
+            self._reject("rejected_thread_busy", 429, f"Too many pending requests for thread '{thread_id}'")
+        ticket = slot.next_ticket
+        slot.next_ticket += 1
+        return slot, ticket
+
+    def _release_thread(self, thread_id: str, ticket: int):
+        """Give up the turn of a ticket, whether it is being served or still waiting"""
+        slot = self._threads[thread_id]
+        if slot.serving == ticket:
+            slot.advance()
+        else:
+            slot.cancelled.add(ticket)
+        if slot.pending == 0:
+            del self._threads[thread_id]
+        self._condition.notify_all()
+
+    def _acquire(self, thread_id: str, slot: _ThreadSlot, ticket: int):
+        """Wait for the turn of the ticket and a global slot, holding a place in the wait queue meanwhile"""
+        # free slots go to requests already waiting first
+        if slot.serving == ticket and not self._slot_waiters and self._in_flight < self.max_concurrent:
+            return
+        if self._queued >= self.max_queue:
+            self._reject("rejected_queue_full", 503, "Server is busy, too many queued requests")
+
+        self._queued += 1
+        self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], self._queued)
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            if not self._condition.wait_for(lambda: slot.serving == ticket,
+                                            timeout=deadline - time.monotonic()):
+                self._reject("rejected_timeout", 503,
+                             f"Server is busy, timed out waiting for the turn of thread '{thread_id}'")
+            # a newer request of the same thread is waiting, it answers instead of this one
+            if self.thread_mode == "supersede" and slot.pending > 1:
+                self._reject("superseded", 409, f"Superseded by a newer request for thread '{thread_id}'",
+                             with_retry_after=False)
+            waiter = object()
+            self._slot_waiters.append(waiter)
+            admitted = self._condition.wait_for(
+                lambda: self._slot_waiters[0] is waiter and self._in_flight < self.max_concurrent,
+                timeout=deadline - time.monotonic())
+            self._slot_waiters.remove(waiter)
+            # the next waiter may be able to take a slot now
+            self._condition.notify_all()
+            if not admitted:
+                self._reject("rejected_timeout", 503, "Server is busy, timed out waiting for a free slot")
+        finally:
+            self._queued -= 1
+
+    @contextmanager
+    def admit(self, thread_id: str) -> Iterator[None]:
+        """
+        Hold the turn of a thread and a global slot for the duration of the block.
+
+        Raises:
+            AdmissionRejected: If the thread or the wait queue is full, the request is
+                superseded, or it cannot get its turn and a slot within queue_timeout
+        """
+        wait_start = time.perf_counter()
+        with self._condition:
+            slot, ticket = self._take_ticket(thread_id)
+            try:
+                self._acquire(thread_id, slot, ticket)
+            except AdmissionRejected:
+                self._release_thread(thread_id, ticket)
+                raise
+            self._in_flight += 1
+            waited = time.perf_counter() - wait_start
+            self._metrics["admitted"] += 1
+            self._metrics["wait_count"] += 1
+            self._metrics["wait_seconds_total"] += waited
+            self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], waited)
+
+        run_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._metrics["run_count"] += 1
+                self._metrics["run_seconds_total"] += time.perf_counter() - run_start
+                self._in_flight -= 1
+                self._release_thread(thread_id, ticket)
+
+    def metrics(self) -> dict:
+        """Get a snapshot of the admission metrics"""
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics.update({
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "thread_queue_depth": sum(slot.pending - 1 for slot in self._threads.values()),
+                "active_threads": len(self._threads),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "wait_seconds_avg": (metrics["wait_seconds_total"] / metrics["wait_count"]
+                                     if metrics["wait_count"] else 0.0),
+            })
+        return metrics
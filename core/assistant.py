@@ -5,6 +5,7 @@ from langgraph.prebuilt import ToolNode
 from langchain_core.messages.utils import count_tokens_approximately
 # from langmem.short_term import SummarizationNode
 from Model.models import llm
+from .stage_timer import stage
 
 class Assistant:
     def __init__(self, runnable: Runnable):
@@ -15,7 +16,8 @@ class Assistant:
         print(f"[INFO] Assistant called with state and config")
         while True:
             print(f"[INFO] Invoking runnable with state")
-            result = self.runnable.invoke(state)
+            with stage("answer"):
+                result = self.runnable.invoke(state)
             
             # If the LLM happens to return an empty response, we will re-prompt it
             # for an actual response.
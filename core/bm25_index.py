@@ -0,0 +1,192 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+from langchain_core.documents import Document
+from core.partitioning import question_key
+
+BM25_DIR = "formatted_data/bm25"
+# Rank constant of reciprocal rank fusion, dampens the weight of the top ranks
+RRF_K = 60
+# Queries with at most this many terms, all rare or identifier-like, are answered by keywords alone
+MAX_KEYWORD_QUERY_TERMS = 3
+# A term is rare when at most this fraction of the questions contain it
+RARE_TERM_DOCUMENT_FRACTION = 0.05
+
+# Identifiers like fseek or malloc stay one token, numbers are kept too
+TOKEN_PATTERN = re.compile(r"[a-z_][a-z0-9_]*|\d+")
+STOPWORDS = {
+    "a", "about", "an", "and", "any", "are", "as", "asked", "at", "be", "by", "can", "do",
+    "does", "explain", "find", "for", "from", "give", "how", "i", "in", "is", "it", "list", "me",
+    "of", "on", "or", "past", "question", "questions", "related", "show", "some", "the", "to",
+    "using", "what", "which", "with", "write", "year", "years",
+}
+
+# Loaded indexes, keyed by collection name
+_index_cache: Dict[str, "BM25Index"] = {}
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def get_bm25_path(collection_name: str) -> str:
+    """Get the file the BM25 index of a collection is stored in"""
+    return os.path.join(BM25_DIR, f"{collection_name}.json")
+
+
+def remove_bm25_index(collection_name: str):
+    """Remove the stored BM25 index of a collection, when the collection is dropped"""
+    _index_cache.pop(collection_name, None)
+    path = get_bm25_path(collection_name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def document_key(doc: Document) -> str:
+    """Identify a question of one exam paper across search results, by its text when it has no id"""
+    if doc.metadata.get('id') is None:
+        return doc.page_content
+    return question_key(doc.metadata)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int) -> List[Document]:
+    """
+    Merge ranked result lists with reciprocal rank fusion.
+
+    Every list adds 1 / (RRF_K + rank) to the score of the questions it returned,
+    so questions found by several retrievers rise to the top.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+            documents.setdefault(key, doc)
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [documents[key] for key in ranked[:k]]
+
+
+class BM25Index:
+    """
+    In-process inverted index scoring questions with BM25.
+
+    An index is not changed once it is saved: ingestion builds a new one from the
+    collection and save swaps it in, so concurrent searches never see a partial update.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: Dict[str, Document] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        # term -> {question key: term frequency}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def load(cls, collection_name: str) -> Optional["BM25Index"]:
+        """Load the BM25 index of a collection, None if it has not been built yet"""
+        if collection_name not in _index_cache:
+            path = get_bm25_path(collection_name)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as file:
+                records = json.load(file)
+            index = cls()
+            index.add_documents([Document(page_content=r["text"], metadata=r["metadata"]) for r in records])
+            _index_cache[collection_name] = index
+        return _index_cache[collection_name]
+
+    def save(self, collection_name: str):
+        """Store the indexed questions of a collection and swap the index in for later searches"""
+        os.makedirs(BM25_DIR, exist_ok=True)
+        records = [{"text": doc.page_content, "metadata": doc.metadata} for doc in self.documents.values()]
+        with open(get_bm25_path(collection_name), 'w', encoding='utf-8') as file:
+            json.dump(records, file, ensure_ascii=False)
+        _index_cache[collection_name] = self
+
+    def remove_document(self, doc_id: str):
+        """Remove a question from the index, by its document_key"""
+        doc = self.documents.pop(doc_id, None)
+        if doc is None:
+            return
+        for term in set(tokenize(doc.page_content)):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def add_documents(self, docs: List[Document]):
+        """Add questions to the index, the same question of the same paper ingested again is replaced"""
+        for doc in docs:
+            doc_id = document_key(doc)
+            self.remove_document(doc_id)
+            terms = tokenize(doc.page_content)
+            self.documents[doc_id] = doc
+            self.doc_lengths[doc_id] = len(terms)
+            self.total_length += len(terms)
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, {})[doc_id] = frequency
+
+    def _is_keyword(self, term: str) -> bool:
+        """Check if a known term is identifier-like (malloc_size, int32) or rare enough to pick questions by itself"""
+        postings = self.postings.get(term)
+        if not postings:
+            return False
+        if "_" in term or (any(c.isdigit() for c in term) and any(c.isalpha() for c in term)):
+            return True
+        return len(postings) <= max(1, RARE_TERM_DOCUMENT_FRACTION * len(self.documents))
+
+    def is_keyword_query(self, query: str) -> bool:
+        """
+        Check if a query is a few specific keywords (e.g. "fseek", "malloc calloc"),
+        which BM25 answers without embeddings. Queries with common terms like
+        "write program" still need the semantic search.
+        """
+        terms = tokenize(query)
+        return 0 < len(terms) <= MAX_KEYWORD_QUERY_TERMS and all(self._is_keyword(term) for term in terms)
+
+    def search(self, query: str, k: int = 5, filter_plan=None) -> List[Document]:
+        """
+        Get the questions that best match the query terms.
+
+        Args:
+            query: Natural language or keyword query
+            k: Maximum number of results to return
+            filter_plan: Optional FilterPlan the question metadata must match
+
+        Returns:
+            Matching questions, best first
+        """
+        if not self.documents:
+            return []
+        average_length = self.total_length / len(self.documents) or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / average_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * length_norm
+                )
+
+        results = []
+        for doc_id in sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True):
+            doc = self.documents[doc_id]
+            if filter_plan is None or filter_plan.matches(doc.metadata):
+                results.append(doc)
+                if len(results) == k:
+                    break
+        return results
@@ -0,0 +1,54 @@
+import os
+from typing import Optional, Union
+from redis import BlockingConnectionPool, Redis
+from langgraph.checkpoint.redis import RedisSaver, ShallowRedisSaver
+
+DEFAULT_REDIS_URI = "redis://localhost:6379"
+CHECKPOINT_MODES = ("full", "shallow")
+
+Checkpointer = Union[RedisSaver, ShallowRedisSaver]
+
+
+def create_checkpointer(redis_url: Optional[str] = None, mode: Optional[str] = None,
+                        max_connections: Optional[int] = None, pool_timeout: Optional[float] = None) -> Checkpointer:
+    """
+    Create a Redis checkpointer backed by a connection pool the caller owns.
+
+    The saver stays usable until close_checkpointer is called, so its lifetime can follow
+    the application instead of a `with` block.
+
+    Args:
+        redis_url: Redis URL, defaults to REDIS_URI
+        mode: "full" keeps every checkpoint of a thread, "shallow" only the latest one.
+              Defaults to CHECKPOINT_MODE
+        max_connections: Size of the connection pool, defaults to REDIS_MAX_CONNECTIONS.
+              LangGraph also writes checkpoints from background threads, so a run can
+              hold more than one connection; callers wait for a free one instead of failing
+        pool_timeout: Seconds to wait for a free connection, defaults to REDIS_POOL_TIMEOUT
+
+    Returns:
+        RedisSaver or ShallowRedisSaver with its indices set up
+    """
+    redis_url = redis_url or os.getenv("REDIS_URI", DEFAULT_REDIS_URI)
+    mode = (mode or os.getenv("CHECKPOINT_MODE", "full")).lower()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Unsupported checkpoint mode '{mode}', expected one of {CHECKPOINT_MODES}")
+    max_connections = max_connections or int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+    pool_timeout = pool_timeout or float(os.getenv("REDIS_POOL_TIMEOUT", 20))
+
+    pool = BlockingConnectionPool.from_url(redis_url, max_connections=max_connections, timeout=pool_timeout)
+    redis_client = Redis(connection_pool=pool)
+    saver_class = ShallowRedisSaver if mode == "shallow" else RedisSaver
+    checkpointer = saver_class(redis_client=redis_client)
+    checkpointer.setup()
+    print(f"[INFO] Created {mode} Redis checkpointer with a pool of {max_connections} connections")
+    return checkpointer
+
+
+def close_checkpointer(checkpointer: Optional[Checkpointer]):
+    """Close the client of a checkpointer created by create_checkpointer and its connection pool"""
+    if checkpointer is None:
+        return
+    redis_client = checkpointer._redis
+    redis_client.close()
+    redis_client.connection_pool.disconnect()
@@ -0,0 +1,71 @@
+import re
+from typing import List, Optional
+from pymilvus import DataType
+
+# Scalar field that Milvus hashes records on. Its value combines subject and BS year,
+# so a filter on it only touches the physical partitions holding that slice.
+PARTITION_KEY_FIELD = "partition_key"
+NUM_PARTITIONS = 64
+UNKNOWN_YEAR = "unknown"
+
+
+def partition_key_schema() -> dict:
+    """
+    Get the `metadata_schema` that makes langchain_milvus create the partition key field.
+    A fresh dict is returned on every call because langchain_milvus consumes it.
+    """
+    return {
+        PARTITION_KEY_FIELD: {
+            "dtype": DataType.VARCHAR,
+            "kwargs": {"max_length": 256, "is_partition_key": True}
+        }
+    }
+
+
+def subject_slug(subject: str) -> str:
+    """Normalize a subject name, e.g. 'computer Programming' -> 'computer_programming'"""
+    return re.sub(r"[^a-z0-9]+", "_", subject.strip().lower()).strip("_")
+
+
+def make_partition_key(subject: str, year_bs: Optional[int]) -> str:
+    """Build the partition key value for a question of a subject and BS year"""
+    year = str(year_bs) if year_bs is not None else UNKNOWN_YEAR
+    return f"{subject_slug(subject)}_{year}"
+
+
+def question_key(metadata: dict) -> str:
+    """
+    Build the key identifying one question of one exam paper.
+
+    The question id ('subject_code+question_number') repeats in the paper of every
+    year, so the paper (BS and AD year, regular or back) is part of the key.
+    """
+    return "|".join(str(metadata.get(field)) for field in ("id", "year_bs", "year_ad", "source"))
+
+
+def candidate_years_bs(year_bs: Optional[List[int]], year_ad: Optional[List[int]]) -> List[int]:
+    """
+    Get the BS years a search can touch.
+
+    An AD year overlaps two BS years (BS = AD + 56 or AD + 57), so both are kept;
+    searches keep the year_ad condition next to the partition keys (see
+    FilterPlan.partition_plan) to narrow the result to the exact year.
+    """
+    if year_bs:
+        return sorted(set(year_bs))
+    if year_ad:
+        return sorted({year + offset for year in year_ad for offset in (56, 57)})
+    return []
+
+
+def partition_keys_for_search(subject: Optional[str], year_bs: Optional[List[int]] = None,
+                              year_ad: Optional[List[int]] = None) -> List[str]:
+    """
+    Get the partition key values a search has to look at.
+
+    Returns an empty list when the search is not restricted to any year, in which
+    case the subject condition alone decides which rows are visible.
+    """
+    if not subject:
+        return []
+    return [make_partition_key(subject, year) for year in candidate_years_bs(year_bs, year_ad)]
@@ -0,0 +1,172 @@
+import json
+import os
+from collections import Counter
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.documents import Document
+from core.partitioning import PARTITION_KEY_FIELD, make_partition_key, question_key
+
+CLUSTERS_DIR = "formatted_data/clusters"
+# Cosine similarity above which two questions are treated as the same question asked again
+CLUSTER_SIMILARITY_THRESHOLD = 0.85
+# Rows of the similarity matrix computed at once, bounds memory on large subjects
+SIMILARITY_BLOCK_SIZE = 1024
+
+# Loaded indexes, keyed by collection name
+_index_cache: Dict[str, "QuestionClusterIndex"] = {}
+
+
+def get_clusters_path(collection_name: str) -> str:
+    """Get the file the cluster index of a collection is stored in"""
+    return os.path.join(CLUSTERS_DIR, f"{collection_name}.json")
+
+
+def remove_question_clusters(collection_name: str):
+    """Remove the stored cluster index of a collection, when the collection is dropped"""
+    _index_cache.pop(collection_name, None)
+    path = get_clusters_path(collection_name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def build_question_clusters(docs: List[Document], embeddings: List[List[float]],
+                            threshold: float = CLUSTER_SIMILARITY_THRESHOLD) -> List[dict]:
+    """
+    Group near-duplicate questions into clusters by embedding similarity.
+
+    Questions are linked when their cosine similarity is at least `threshold` and they
+    belong to the same subject; clusters are the connected groups of linked questions.
+
+    Args:
+        docs: Question documents of the whole collection
+        embeddings: Stored embedding of each document
+        threshold: Minimum cosine similarity for two questions to be linked
+
+    Returns:
+        List of cluster records sorted by frequency, most repeated first
+    """
+    if not docs:
+        return []
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    # Union-find over the linked pairs
+    parent = list(range(len(docs)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Only questions of the same subject can be linked, so similarities are computed per subject
+    subjects: Dict[str, List[int]] = {}
+    for i, doc in enumerate(docs):
+        subjects.setdefault(doc.metadata.get('subject'), []).append(i)
+
+    for members in subjects.values():
+        members = np.asarray(members)
+        subject_vectors = vectors[members]
+        for start in range(0, len(members), SIMILARITY_BLOCK_SIZE):
+            # each block is compared with itself and the questions after it
+            similarity = subject_vectors[start:start + SIMILARITY_BLOCK_SIZE] @ subject_vectors[start:].T
+            rows, cols = np.nonzero(np.triu(similarity >= threshold, k=1))
+            for i, j in zip(members[rows + start].tolist(), members[cols + start].tolist()):
+                parent[find(i)] = find(j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(docs)):
+        groups.setdefault(find(i), []).append(i)
+
+    clusters = []
+    for members in groups.values():
+        metadatas = [docs[i].metadata for i in members]
+        # The most recent occurrence represents the cluster
+        representative = max(members, key=lambda i: docs[i].metadata.get('year_bs') or 0)
+        rep_metadata = docs[representative].metadata
+        # Each distinct exam paper counts once, a question split in parts is not a repeat
+        papers = {(m.get('year_bs'), m.get('year_ad'), m.get('source')) for m in metadatas}
+
+        clusters.append({
+            "question": docs[representative].page_content,
+            "question_ids": [m.get('id') for m in metadatas],
+            "question_keys": [question_key(m) for m in metadatas],
+            "years_bs": sorted({m['year_bs'] for m in metadatas if m.get('year_bs') is not None}),
+            "years_ad": sorted({m['year_ad'] for m in metadatas if m.get('year_ad') is not None}),
+            "frequency": len(papers),
+            "subject": rep_metadata.get('subject'),
+            "topic": Counter(m.get('topic') for m in metadatas).most_common(1)[0][0],
+            "unit": rep_metadata.get('unit'),
+            "type": rep_metadata.get('type'),
+            "format": rep_metadata.get('format'),
+            "marks": rep_metadata.get('marks'),
+            "source": rep_metadata.get('source'),
+            "semester": rep_metadata.get('semester'),
+        })
+
+    clusters.sort(key=lambda cluster: (-cluster["frequency"], cluster["question"]))
+    for cluster_id, cluster in enumerate(clusters):
+        cluster["cluster_id"] = cluster_id
+    return clusters
+
+
+class QuestionClusterIndex:
+    """Precomputed clusters of repeated questions, used to answer "most asked" queries in one lookup."""
+
+    def __init__(self, clusters: List[dict]):
+        self.clusters = clusters
+        self._filter_views = [self._filter_view(cluster) for cluster in clusters]
+
+    @classmethod
+    def load(cls, collection_name: str) -> Optional["QuestionClusterIndex"]:
+        """Load the cluster index of a collection, None if it has not been built yet"""
+        if collection_name not in _index_cache:
+            path = get_clusters_path(collection_name)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as file:
+                _index_cache[collection_name] = cls(json.load(file))
+        return _index_cache[collection_name]
+
+    def save(self, collection_name: str):
+        """Store the cluster index of a collection and make it visible to later lookups"""
+        os.makedirs(CLUSTERS_DIR, exist_ok=True)
+        with open(get_clusters_path(collection_name), 'w', encoding='utf-8') as file:
+            json.dump(self.clusters, file, ensure_ascii=False, indent=2)
+        _index_cache[collection_name] = self
+
+    @staticmethod
+    def _filter_view(cluster: dict) -> dict:
+        """Expose a cluster with the field names of a question record, multi-valued where members differ"""
+        return {
+            **cluster,
+            "id": cluster["question_ids"],
+            "year_bs": cluster["years_bs"],
+            "year_ad": cluster["years_ad"],
+            PARTITION_KEY_FIELD: [make_partition_key(cluster["subject"], year) for year in cluster["years_bs"]],
+        }
+
+    def most_repeated(self, filter_plan, k: int = 5, min_frequency: int = 2) -> List[Document]:
+        """
+        Get the most repeated questions matching the filters.
+
+        Args:
+            filter_plan: Compiled FilterPlan of the query, years match if any year of the cluster does
+            k: Maximum number of clusters to return
+            min_frequency: Minimum number of exam papers a question must appear in
+
+        Returns:
+            One Document per cluster, with its years and frequency in the metadata
+        """
+        results = []
+        for cluster, filter_view in zip(self.clusters, self._filter_views):
+            # clusters are sorted by frequency, nothing after this one repeats enough
+            if cluster["frequency"] < min_frequency:
+                break
+            if filter_plan.matches(filter_view):
+                metadata = {key: value for key, value in cluster.items() if key != "question"}
+                results.append(Document(page_content=cluster["question"], metadata=metadata))
+                if len(results) == k:
+                    break
+        return results
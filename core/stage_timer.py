@@ -0,0 +1,43 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+# Stats of the request being recorded, shared with the graph nodes through the context
+_current_stats: ContextVar[Optional[dict]] = ContextVar("stage_stats", default=None)
+
+
+@contextmanager
+def record_stages() -> Iterator[dict]:
+    """
+    Record per-stage timings and retrieved question keys of everything run inside the block.
+
+    Yields:
+        Dictionary filled with {"timings": {stage: ms}, "retrieved_ids": [...]}
+    """
+    stats = {"timings": {}, "retrieved_ids": []}
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage, stages run more than once per request are summed. No-op when nothing is recording."""
+    stats = _current_stats.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats["timings"][name] = round(stats["timings"].get(name, 0.0) + elapsed_ms, 3)
+
+
+def record_retrieved_ids(ids: List[str]):
+    """Add the keys (see partitioning.question_key) of retrieved questions to the request being recorded"""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats["retrieved_ids"].extend(ids)
@@ -0,0 +1,129 @@
+import os
+from typing import Dict, Optional
+from pymilvus import Collection, utility
+
+# Field names of the collections created by langchain_milvus
+VECTOR_FIELD = "vector"
+TEXT_FIELD = "text"
+INDEX_TYPES = ["FLAT", "HNSW", "IVF_FLAT"]
+
+# Build parameters for each supported index type
+DEFAULT_BUILD_PARAMS = {
+    "FLAT": {},
+    "HNSW": {"M": 16, "efConstruction": 200},
+    "IVF_FLAT": {"nlist": 128},
+}
+
+# Search parameters for each supported index type
+DEFAULT_SEARCH_PARAMS = {
+    "FLAT": {},
+    "HNSW": {"ef": 64},
+    "IVF_FLAT": {"nprobe": 16},
+}
+
+# Index type of each collection, read from Milvus once and updated by build_index
+_collection_index_types: Dict[str, str] = {}
+
+
+def get_index_type(index_type: Optional[str] = None) -> str:
+    """Get the index type to use, falling back to the MILVUS_INDEX_TYPE environment variable"""
+    index_type = (index_type or os.getenv("MILVUS_INDEX_TYPE", "HNSW")).upper()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type '{index_type}', expected one of {INDEX_TYPES}")
+    return index_type
+
+
+def get_metric_type() -> str:
+    """Get the distance metric shared by index building and searching"""
+    return os.getenv("MILVUS_METRIC_TYPE", "L2").upper()
+
+
+def get_index_params(index_type: Optional[str] = None, build_params: Optional[dict] = None) -> dict:
+    """
+    Build the Milvus index parameters for an index type.
+
+    Args:
+        index_type: One of INDEX_TYPES, defaults to MILVUS_INDEX_TYPE
+        build_params: Overrides for the default build parameters (e.g. {"M": 32})
+
+    Returns:
+        Dictionary accepted by Collection.create_index
+    """
+    index_type = get_index_type(index_type)
+    params = dict(DEFAULT_BUILD_PARAMS[index_type])
+    if index_type == "HNSW":
+        params["M"] = int(os.getenv("MILVUS_HNSW_M", params["M"]))
+        params["efConstruction"] = int(os.getenv("MILVUS_HNSW_EF_CONSTRUCTION", params["efConstruction"]))
+    elif index_type == "IVF_FLAT":
+        params["nlist"] = int(os.getenv("MILVUS_IVF_NLIST", params["nlist"]))
+    params.update(build_params or {})
+    return {"index_type": index_type, "metric_type": get_metric_type(), "params": params}
+
+
+def get_collection_index_type(collection_name: str, field_name: str = VECTOR_FIELD) -> str:
+    """
+    Get the index type a collection was actually built with, so search params match it
+    whatever MILVUS_INDEX_TYPE says. Indexes this module does not tune (e.g. the AUTOINDEX
+    of a collection never passed through build_index) are searched like FLAT, without params.
+    """
+    if collection_name not in _collection_index_types:
+        index_type = "FLAT"
+        for index in Collection(collection_name).indexes:
+            if index.field_name == field_name:
+                index_type = str(index.params.get("index_type", "FLAT")).upper()
+        _collection_index_types[collection_name] = index_type if index_type in INDEX_TYPES else "FLAT"
+    return _collection_index_types[collection_name]
+
+
+def get_search_params(index_type: Optional[str] = None, k: Optional[int] = None,
+                      search_params: Optional[dict] = None) -> dict:
+    """
+    Build the Milvus search parameters for an index type.
+
+    Args:
+        index_type: One of INDEX_TYPES, defaults to MILVUS_INDEX_TYPE
+        k: Number of results requested, HNSW needs ef to be at least k
+        search_params: Per request overrides (e.g. {"ef": 128} or {"nprobe": 32})
+
+    Returns:
+        Dictionary passed as `param` to the Milvus search
+    """
+    index_type = get_index_type(index_type)
+    params = dict(DEFAULT_SEARCH_PARAMS[index_type])
+    if index_type == "HNSW":
+        params["ef"] = int(os.getenv("MILVUS_SEARCH_EF", params["ef"]))
+    elif index_type == "IVF_FLAT":
+        params["nprobe"] = int(os.getenv("MILVUS_SEARCH_NPROBE", params["nprobe"]))
+    params.update(search_params or {})
+    if index_type == "HNSW" and k:
+        params["ef"] = max(params["ef"], k)
+    return {"metric_type": get_metric_type(), "params": params}
+
+
+def build_index(collection_name: str, index_params: dict, field_name: str = VECTOR_FIELD):
+    """
+    (Re)build the vector index of a collection once all of its data is loaded.
+
+    Flushing first seals the inserted segments, so the index is built over the whole
+    bulk load in one pass instead of segment by segment while data is still arriving.
+
+    Args:
+        collection_name: Collection to index
+        index_params: Parameters from get_index_params
+        field_name: Vector field to index
+    """
+    if not utility.has_collection(collection_name):
+        raise ValueError(f"Collection name '{collection_name}' does not exist in database")
+
+    collection = Collection(collection_name)
+    collection.flush()
+    collection.release()
+    if collection.has_index():
+        collection.drop_index()
+
+    print(f"[INFO] Building {index_params['index_type']} index on {collection_name} with {index_params['params']}")
+    collection.create_index(field_name=field_name, index_params=index_params)
+    utility.wait_for_index_building_complete(collection_name)
+    _collection_index_types[collection_name] = index_params["index_type"]
+    collection.load()
+    print(f"[INFO] Index built and collection loaded: {collection_name}")
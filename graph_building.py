@@ -5,11 +5,11 @@ from core.state import State
 from Graph.assistants.c_programing_agent import get_c_programming_runnable
 from langgraph.graph import START, END 
 from Graph.routes.c_programming_router import agent_router
-from langgraph.checkpoint.redis import RedisSaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from core.assistant import create_summarization_node
 
 
-def build_graph(checkpointer: RedisSaver):
+def build_graph(checkpointer: BaseCheckpointSaver):
     builder = StateGraph(State)
 
     builder.add_node("c_programming_assistant", Assistant(get_c_programming_runnable()))
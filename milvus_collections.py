@@ -1,4 +1,6 @@
 from pymilvus import connections, utility
+from core.bm25_index import remove_bm25_index
+from core.question_clusters import remove_question_clusters
 
 def test_milvus_connection():
     try:
@@ -36,6 +38,8 @@ def remove_collection(collection_name):
         if utility.has_collection(collection_name):
             # Drop the collection
             utility.drop_collection(collection_name)
+            remove_bm25_index(collection_name)
+            remove_question_clusters(collection_name)
             print(f"Successfully removed collection: {collection_name}")
         else:
             print(f"Collection '{collection_name}' does not exist")
@@ -5,16 +5,18 @@ from langchain_core.messages import HumanMessage
 from graph_building import build_graph
 from core.db_manager import db_manager
 from dotenv import load_dotenv
-from langgraph.checkpoint.redis import RedisSaver
 from utilities import should_reset_checkpoint, delete_thread_checkpoints
+from core.admission import AdmissionController, AdmissionRejected
+from core.checkpointer import create_checkpointer, close_checkpointer
 
 load_dotenv()
 
 app = FastAPI()
 vector_manager = IoePastQuestionsVectorStore()
+# Serializes requests per sender and bounds the graph runs (LLM calls) in flight
+admission = AdmissionController.from_env()
 
-# Initialize Redis connection
-DB_URI = "redis://localhost:6379"
+# Redis checkpointer, owned by the app from startup to shutdown
 redis_saver = None
 graph = None
 
@@ -27,10 +29,8 @@ async def startup_event():
     db_manager
     
     # Initialize Redis and graph
-    with RedisSaver.from_conn_string(DB_URI) as checkpointer:
-        checkpointer.setup()
-        graph = build_graph(checkpointer)
-        redis_saver = checkpointer
+    redis_saver = create_checkpointer()
+    graph = build_graph(redis_saver)
     
     print("[INFO] Database connection initialized successfully")
 
@@ -38,20 +38,21 @@ async def startup_event():
 async def shutdown_event():
     """Clean up Redis connection when the application shuts down"""
     print("[INFO] Cleaning up Redis connection...")
-    if redis_saver:
-        redis_saver.close()
+    close_checkpointer(redis_saver)
     print("[INFO] Redis connection closed")
 
 @app.post("/update-vector-store")
 def update_vector_store(
     collection_name: str = Form(..., description="Name of the collection to update"),
-    file_path: str = Form("formatted_data/c_question.json", description="Path to the JSON file")
+    file_path: str = Form("formatted_data/c_question.json", description="Path to the JSON file"),
+    index_type: Optional[str] = Form(None, description="ANN index to build after loading (FLAT, HNSW or IVF_FLAT)")
 ):
     try:
         print(f"[INFO] Attempting to update vector store for collection: {collection_name}")
         vector_store = vector_manager.update_vector_store(
             collection_name=collection_name,
-            file_path=file_path
+            file_path=file_path,
+            index_type=index_type
         )
         print(f"[INFO] Successfully updated vector store for collection: {collection_name}")
         return {
@@ -72,6 +73,28 @@ def process_query(
     sender_id: str = Form(..., description="Unique identifier for the sender"),
     metadata: Optional[str] = Form("metadata_from_front_end", description="Metadata information from frontend")
 ):
+    try:
+        # Requests of one sender run one at a time, and only a bounded number run at once
+        with admission.admit(sender_id):
+            return answer_query(query, sender_id)
+    except AdmissionRejected as e:
+        print(f"[INFO] Rejected query from sender {sender_id}: {e.detail}")
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers=headers
+        )
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Admission metrics: requests in flight, queue depth, wait times and rejections"""
+    return admission.metrics()
+
+
+def answer_query(query: str, sender_id: str):
+    """Run a query through the graph on the thread of the sender"""
     try:
         print(f"[INFO] Received query from sender {sender_id}: {query}")
         
@@ -5,17 +5,25 @@ def should_reset_checkpoint(query: str) -> bool:
     """Check if the query contains any reset keywords"""
     return any(keyword in query.lower() for keyword in RESET_KEYWORDS)
 
-from langgraph.checkpoint.redis import RedisSaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
-def delete_thread_checkpoints(redis_saver: RedisSaver, thread_id: str):
+def delete_thread_checkpoints(redis_saver: BaseCheckpointSaver, thread_id: str):
     """Delete all checkpoints for a specific thread ID
     
     Args:
-        redis_saver: RedisSaver instance
+        redis_saver: RedisSaver or ShallowRedisSaver instance
         thread_id: The thread ID to delete checkpoints for
     """
     if redis_saver:
         try:
+            # Savers that know their own key layout (including the shallow one) delete the thread themselves
+            try:
+                redis_saver.delete_thread(thread_id)
+                print(f"[INFO] Deleted checkpoints for thread_id: {thread_id}")
+                return
+            except NotImplementedError:
+                pass
+
             # Get the Redis client from the saver
             redis_client = redis_saver._redis
             
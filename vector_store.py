@@ -2,8 +2,12 @@ import json
 from langchain_core.documents import Document
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_milvus import Milvus
-from pymilvus import utility
+from pymilvus import Collection, utility
 from core.db_manager import db_manager
+from core.vector_index import TEXT_FIELD, VECTOR_FIELD, build_index, get_index_params
+from core.bm25_index import BM25Index
+from core.question_clusters import QuestionClusterIndex, build_question_clusters
+from core.partitioning import PARTITION_KEY_FIELD, partition_key_schema, NUM_PARTITIONS, make_partition_key
 
 class IoePastQuestionsVectorStore:
     def __init__(self, host="127.0.0.1", port="19530"):
@@ -24,6 +28,8 @@ class IoePastQuestionsVectorStore:
         docs = []
         for item in json_data:
             metadata = {k: v for k, v in item.items() if (k != 'question' and k != 'tags')}
+            # Records are hashed into partitions by subject and year so searches can prune them
+            metadata[PARTITION_KEY_FIELD] = make_partition_key(item['subject'], item.get('year_bs'))
             doc = Document(
                 page_content=item['question'],
                 metadata=metadata
@@ -35,8 +41,14 @@ class IoePastQuestionsVectorStore:
         """Get an existing vector store for a collection"""
         return db_manager.get_vector_store(collection_name)
     
-    def update_vector_store(self, collection_name, file_path="formatted_data/c_question.json"):
-        """Update a collection with documents from a JSON file"""
+    def update_vector_store(self, collection_name, file_path="formatted_data/c_question.json",
+                            index_type=None, index_build_params=None):
+        """
+        Update a collection with documents from a JSON file
+
+        Documents are bulk loaded behind a FLAT index, the configured ANN index
+        (index_type, defaults to MILVUS_INDEX_TYPE) is built once after the load.
+        """
 
         # TODO add this validation check later
         # if not utility.has_collection(collection_name):
@@ -45,9 +57,70 @@ class IoePastQuestionsVectorStore:
         json_data = self.load_json_data(file_path)
         docs = self.create_documents_from_json(json_data)
 
-        return Milvus.from_documents(
+        index_params = get_index_params(index_type, index_build_params)
+
+        vector_store = Milvus.from_documents(
             docs,
             embedding=self.embeddings,
             connection_args=self.connection_args,
-            collection_name=collection_name
+            collection_name=collection_name,
+            metadata_schema=partition_key_schema(),
+            num_partitions=NUM_PARTITIONS,
+            index_params=get_index_params("FLAT")
         )
+        build_index(collection_name, index_params)
+        # the lexical index and the clusters are rebuilt from what the collection holds,
+        # so questions of earlier loads are kept and dropped collections leave nothing behind
+        collection_docs, embeddings = self.read_collection(collection_name)
+        self.update_lexical_index(collection_name, collection_docs)
+        self.update_question_clusters(collection_name, collection_docs, embeddings)
+        return vector_store
+
+    def read_collection(self, collection_name, batch_size=1000):
+        """
+        Read back every question of a collection with its stored embedding
+
+        Returns:
+            Tuple of the question Documents, with their metadata and partition key, and their embeddings
+        """
+        collection = Collection(collection_name)
+        output_fields = [field.name for field in collection.schema.fields]
+        docs, embeddings = [], []
+        iterator = collection.query_iterator(batch_size=batch_size, output_fields=output_fields)
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                for record in batch:
+                    embeddings.append(record[VECTOR_FIELD])
+                    metadata = {k: v for k, v in record.items()
+                                if k not in (VECTOR_FIELD, TEXT_FIELD, "pk")}
+                    docs.append(Document(page_content=record[TEXT_FIELD], metadata=metadata))
+        finally:
+            iterator.close()
+        return docs, embeddings
+
+    def update_lexical_index(self, collection_name, docs):
+        """
+        Rebuild the BM25 index of a collection from all of its questions
+
+        A new index is built and swapped in by save, searches running meanwhile keep
+        using the previous one.
+        """
+        lexical_index = BM25Index()
+        lexical_index.add_documents(docs)
+        lexical_index.save(collection_name)
+        print(f"[INFO] BM25 index of {collection_name} holds {len(lexical_index)} questions")
+
+    def update_question_clusters(self, collection_name, docs, embeddings):
+        """
+        Group repeated questions of a collection into clusters and store the cluster index
+
+        Clusters are rebuilt over the whole collection (docs and embeddings from
+        read_collection), so questions loaded from earlier files are matched against the new ones.
+        """
+        clusters = build_question_clusters(docs, embeddings)
+        QuestionClusterIndex(clusters).save(collection_name)
+        repeated = sum(1 for cluster in clusters if cluster["frequency"] > 1)
+        print(f"[INFO] Stored {len(clusters)} question clusters ({repeated} repeated) for collection: {collection_name}")